@@ -4,7 +4,8 @@ from utilis import (
     render_mathml,
     render_unicode,
     generate_comparison_pdf,
-    get_placeholder_latex
+    get_placeholder_latex,
+    PNG_RENDER_SETTINGS
 )
 
 # --- Configuration ---
@@ -24,21 +25,67 @@ latex_input = st.text_area(
     key="latex_code"
 )
 
+# --- Cached Rendering ---
+# Streamlit reruns the whole script on every edit, so identical formulas are
+# served from a disk-backed cache instead of re-running matplotlib. The render
+# settings are part of the key so changing them invalidates persisted images.
+@st.cache_data(persist="disk", max_entries=1024, show_spinner=False)
+def cached_matplotlib_png(latex_code: str, render_settings: tuple) -> str:
+    png_uri = render_matplotlib_png(latex_code)
+    if not png_uri:
+        # Raising keeps failures out of the persisted cache.
+        raise ValueError("Matplotlib rendering failed.")
+    return png_uri
+
+# --- PDF Generation Fragment ---
+# Runs as a fragment so interacting with the download button only reruns this
+# block instead of re-rendering the preview.
+@st.fragment
+def pdf_section(latex_code: str):
+    st.markdown("---")
+    st.subheader("Generate Comparison PDF")
+    st.info("Click below to generate a single PDF report showing how all three methods render side-by-side in the final WeasyPrint output.")
+    
+    # The PDF runs all three renderers plus WeasyPrint, so only build it on
+    # request rather than on every keystroke.
+    if st.button("📄 Generate Comparison PDF"):
+        st.session_state.pdf_report = (latex_code, generate_comparison_pdf(latex_code))
+
+    pdf_report = st.session_state.get("pdf_report")
+    if pdf_report and pdf_report[0] == latex_code:
+        st.download_button(
+            label="⬇️ Download Full Comparison PDF",
+            data=pdf_report[1],
+            file_name="latex_rendering_comparison_report.pdf",
+            mime="application/pdf"
+        )
+
 # --- Dynamic Comparison Preview ---
 
 if latex_input:
     st.subheader("Real-time Rendering Comparison")
 
-    tab_png, tab_mathml, tab_unicode = st.tabs([
+    # A radio instead of tabs: st.tabs executes every tab's body on each rerun,
+    # whereas only the selected method needs to be rendered.
+    method_png, method_mathml, method_unicode = (
         "✅ 1. Matplotlib (PNG Image)", 
         "⚠️ 2. MathML (HTML/CSS)", 
         "📄 3. Unicode Text"
-    ])
+    )
+    method = st.radio(
+        "Rendering Method",
+        [method_png, method_mathml, method_unicode],
+        horizontal=True,
+        key="render_method"
+    )
 
     # --- Matplotlib (PNG) Preview ---
-    with tab_png:
+    if method == method_png:
         st.markdown("This method converts LaTeX to a **high-res PNG image**. It's the most reliable for complex math, as the PDF only embeds a static picture.")
-        png_uri = render_matplotlib_png(latex_input)
+        try:
+            png_uri = cached_matplotlib_png(latex_input.strip(), PNG_RENDER_SETTINGS)
+        except ValueError:
+            png_uri = ""
         
         if png_uri:
             st.image(png_uri, caption="Matplotlib Rendered Image (High Quality)")
@@ -47,7 +94,7 @@ if latex_input:
             st.error("Matplotlib rendering failed. Check LaTeX syntax or package installation.")
     
     # --- MathML Preview ---
-    with tab_mathml:
+    elif method == method_mathml:
         st.markdown("This method converts LaTeX to **MathML XML**. Its rendering quality depends entirely on the PDF engine's ability to display native MathML via HTML/CSS.")
         mathml_output = render_mathml(latex_input)
         
@@ -60,25 +107,13 @@ if latex_input:
             st.error(f"MathML conversion failed: {mathml_output}")
 
     # --- Unicode Preview ---
-    with tab_unicode:
+    else:
         st.markdown("This converts math commands to **plain Unicode characters**. Useful for accessibility but will break complex formulas (e.g., fractions, roots).")
         unicode_output = render_unicode(latex_input)
         st.code(unicode_output, language="text")
 
     # --- PDF Generation ---
-    st.markdown("---")
-    st.subheader("Generate Comparison PDF")
-    st.info("Click below to generate a single PDF report showing how all three methods render side-by-side in the final WeasyPrint output.")
-    
-    pdf_bytes = generate_comparison_pdf(latex_input)
-    
-    st.download_button(
-        label="⬇️ Download Full Comparison PDF",
-        data=pdf_bytes,
-        file_name="latex_rendering_comparison_report.pdf",
-        mime="application/pdf"
-    )
+    pdf_section(latex_input)
 
 else:
     st.info("Please enter a LaTeX expression above to start the tests.")
-
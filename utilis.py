@@ -1,15 +1,20 @@
 import io
 import base64
 import random
-from jinja2 import Template
-from weasyprint import HTML
+import threading
+import functools
+from pathlib import Path
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
 
 # --- Libraries for different rendering methods ---
 
 # 1. Matplotlib (High-Quality Raster/PNG)
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+# Only the object-oriented API is used, so pyplot and backend selection are
+# skipped.
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 # 2. MathML (WeasyPrint Native HTML/CSS Interpretation)
 from latex2mathml.converter import convert as latex_to_mathml
@@ -17,26 +22,78 @@ from latex2mathml.converter import convert as latex_to_mathml
 # 3. Unicode Text (Plain text conversion)
 import latex2unicode
 
+# --- Shared PDF Engine State ---
+
+# Templates are resolved next to this module (not the CWD) and compiled once;
+# auto_reload=False skips the on-disk freshness check on every lookup.
+_TEMPLATE_ENV = Environment(
+    loader=FileSystemLoader(Path(__file__).parent),
+    auto_reload=False
+)
+
+# Created once per process so font lookups and registrations are reused across
+# PDF renders instead of being rebuilt on every Streamlit rerun.
+_FONT_CONFIG = FontConfiguration()
+
+# The report stylesheet (including the bundled Noto Sans @font-face rules) is
+# parsed once, on first use, rather than from a <style> block on every render.
+@functools.lru_cache(maxsize=1)
+def _get_report_css() -> CSS:
+    return CSS(
+        filename=str(Path(__file__).parent / "template.css"),
+        font_config=_FONT_CONFIG
+    )
+
+# The shared FontConfiguration wraps Pango/fontconfig state that is not safe to
+# use from several threads at once, and Streamlit renders each session on its
+# own thread, so PDF renders are serialised.
+_PDF_LOCK = threading.Lock()
+
+# --- Matplotlib PNG Settings ---
+
+# Settings for the PNG method. Callers that cache the output (e.g. the app's
+# disk cache) include these in their key so a change invalidates old images.
+# High DPI (300) ensures a sharp, print-quality image.
+PNG_DPI = 300
+PNG_FONTSIZE = 16
+PNG_PAD_INCHES = 0.1
+PNG_RENDER_SETTINGS = (PNG_DPI, PNG_FONTSIZE, PNG_PAD_INCHES)
+
+# --- Shared Matplotlib State ---
+
+# A single figure is reused for every render instead of allocating a new one
+# per call. Streamlit serves sessions from several threads, so access to it is
+# serialised with a lock.
+_MATH_FIG = Figure(figsize=(4, 1), dpi=PNG_DPI)
+FigureCanvasAgg(_MATH_FIG)
+_MATH_AX = _MATH_FIG.add_axes([0, 0, 1, 1])
+_MATH_LOCK = threading.Lock()
+
 # --- Core Comparison Functions ---
 
 def render_matplotlib_png(latex_code: str) -> str:
     """Renders LaTeX to a high-DPI PNG and returns it as a Base64 Data URI."""
+    # Surrounding whitespace does not change the image, so strip it before the
+    # cache lookup; the preview and the PDF then share the same entry.
+    return _render_matplotlib_png(latex_code.strip())
+
+# The output depends only on the LaTeX string, so repeated formulas (and the
+# PDF re-rendering what the preview already drew) reuse the cached data URI.
+@functools.lru_cache(maxsize=512)
+def _render_matplotlib_png(latex_code: str) -> str:
     try:
-        # High DPI (300) ensures a sharp, print-quality image.
-        fig = plt.figure(figsize=(4, 1), dpi=300)
-        ax = fig.add_axes([0, 0, 1, 1])
-        
-        # Must be wrapped in $...$ for Matplotlib to interpret as math.
-        ax.text(0.5, 0.5, f'${latex_code}$', 
-                fontsize=16, 
-                verticalalignment='center', 
-                horizontalalignment='center')
-        
-        ax.axis('off') # Hide the default axes
-        
         buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0.1, transparent=True)
-        plt.close(fig) 
+        with _MATH_LOCK:
+            _MATH_AX.clear()
+            _MATH_AX.axis('off') # Hide the default axes
+            
+            # Must be wrapped in $...$ for Matplotlib to interpret as math.
+            _MATH_AX.text(0.5, 0.5, f'${latex_code}$', 
+                          fontsize=PNG_FONTSIZE, 
+                          verticalalignment='center', 
+                          horizontalalignment='center')
+            
+            _MATH_FIG.savefig(buf, format='png', bbox_inches='tight', pad_inches=PNG_PAD_INCHES, transparent=True)
         
         base64_encoded_data = base64.b64encode(buf.getvalue()).decode('utf-8')
         return f"data:image/png;base64,{base64_encoded_data}"
@@ -71,13 +128,10 @@ def generate_comparison_pdf(latex_code: str) -> bytes:
 
     # Load and render HTML template
     try:
-        with open("template.html", "r", encoding="utf-8") as f:
-            template_str = f.read()
-    except FileNotFoundError:
+        template = _TEMPLATE_ENV.get_template("template.html")
+    except TemplateNotFound:
         return b"Error: template.html not found."
 
-    template = Template(template_str)
-    
     html_content = template.render(
         latex_input=latex_code,
         png_uri=png_uri,
@@ -90,11 +144,19 @@ def generate_comparison_pdf(latex_code: str) -> bytes:
     )
 
     # Convert HTML → PDF
-    pdf_file = io.BytesIO()
-    # We set a base URL to handle external resources like Google Fonts
-    HTML(string=html_content, base_url='').write_pdf(pdf_file)
-    pdf_file.seek(0)
-    return pdf_file.read()
+    # With no target, write_pdf returns the bytes directly, avoiding an extra
+    # BytesIO copy of the whole document.
+    with _PDF_LOCK:
+        # Parsed under the lock too, since it also uses the shared font config.
+        try:
+            report_css = _get_report_css()
+        except FileNotFoundError:
+            return b"Error: template.css not found."
+
+        return HTML(string=html_content, base_url=str(Path(__file__).parent)).write_pdf(
+            stylesheets=[report_css],
+            font_config=_FONT_CONFIG
+        )
 
 def get_placeholder_latex() -> str:
     """Provides a complex equation for initial testing."""